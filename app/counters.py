@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Min
+from django.utils.functional import cached_property
+from app.models import Question, Answer, ArchivedAnswer
+
+DEFAULT_ESTIMATE_TIMEOUT = 300  # Seconds an estimate is trusted when there is no counter
+DEFAULT_TIMEOUT = 24 * 60 * 60  # Seconds an exact counter is kept until the next recount
+
+RECOUNT_BATCH_SIZE = 1000
+
+QUESTIONS_KEY = 'count:questions'
+
+
+def tag_key(tag_name):
+    return f'count:tag:{tag_name}'
+
+
+def answers_key(question_id):
+    return f'count:answers:{question_id}'
+
+
+def archived_answers_key(question_id):
+    return f'count:archived-answers:{question_id}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'COUNTERS_CACHE', 'default')]
+
+
+def counters_shared():
+    # Counters in a per-process cache are seen and updated by a single worker only,
+    # they would drift apart, so only the cached fallback counts are used then
+    return not isinstance(get_cache(), LocMemCache)
+
+
+def counters_timeout():
+    return getattr(settings, 'COUNTERS_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def set_counter(key, value):
+    if counters_shared():
+        get_cache().set(key, value, counters_timeout())
+
+
+def add_to_counter(key, delta):
+    if not counters_shared():
+        return
+    # Only counters which have been set are maintained, a missing one falls back to the estimate
+    try:
+        get_cache().incr(key, delta)
+    except ValueError:
+        pass
+
+
+def drop_counter(key):
+    if counters_shared():
+        get_cache().delete(key)
+
+
+def get_count(key, estimate):
+    """Exact counter if there is one, otherwise the estimate cached for COUNTERS_ESTIMATE_TIMEOUT"""
+    cache = get_cache()
+    count = cache.get(key) if counters_shared() else None
+    if count is not None:
+        return count
+    estimate_key = f'estimate:{key}'
+    count = cache.get(estimate_key)
+    if count is None:
+        count = estimate()
+        cache.set(estimate_key, count, getattr(settings, 'COUNTERS_ESTIMATE_TIMEOUT', DEFAULT_ESTIMATE_TIMEOUT))
+    return count
+
+
+def estimate_questions():
+    # Range of primary keys is an index lookup, unlike a full COUNT(*)
+    bounds = Question.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+    return bounds['last'] - bounds['first'] + 1
+
+
+def questions_count():
+    return get_count(QUESTIONS_KEY, estimate_questions)
+
+
+# There is no cheap approximation for the tag and answer counts, so their
+# fallback is the exact COUNT over an indexed column, cached like an estimate
+def tag_questions_count(tag_name):
+    return get_count(tag_key(tag_name), Question.objects.get_tagged(tag_name).count)
+
+
+def answers_count(question_id):
+    return get_count(answers_key(question_id), Answer.objects.filter(question_id=question_id).count)
+
+
+def archived_answers_count(question_id):
+    return get_count(archived_answers_key(question_id),
+                     ArchivedAnswer.objects.filter(question_id=question_id).count)
+
+
+def question_answers_count(question):
+    # Archived questions keep their primary key, so their counts get keys of their own
+    if question.is_archived:
+        return archived_answers_count(question.pk)
+    return answers_count(question.pk)
+
+
+def recount():
+    """Set exact counters for all questions, tags and answers from the database.
+
+    Also run periodically, it corrects counters which drifted from concurrent updates.
+    """
+    if not counters_shared():
+        return
+    cache = get_cache()
+    cache.set(QUESTIONS_KEY, Question.objects.count(), counters_timeout())
+    tag_counts = Question.tags.through.objects.values_list('tag__name').annotate(total=Count('pk'))
+    cache.set_many({tag_key(tag_name): count for tag_name, count in tag_counts}, counters_timeout())
+    # Questions without answers have no row here, their counters expire into a cached COUNT
+    answer_counts = Answer.objects.values_list('question_id').annotate(total=Count('pk')).order_by()
+    batch = {}
+    for question_id, count in answer_counts.iterator():
+        batch[answers_key(question_id)] = count
+        if len(batch) >= RECOUNT_BATCH_SIZE:
+            cache.set_many(batch, counters_timeout())
+            batch = {}
+    cache.set_many(batch, counters_timeout())
+
+
+class CountedPaginator(Paginator):
+    """Paginator taking the total number of objects from a count provider instead of COUNT(*)"""
+
+    def __init__(self, object_list, per_page, count_provider=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_provider = count_provider
+
+    @cached_property
+    def count(self):
+        if self.count_provider is None:
+            return super().count
+        return self.count_provider()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+from threading import Lock
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_POLL_INTERVAL = 5  # Seconds, None disables polling
+
+logger = logging.getLogger(__name__)
+
+
+async def run_query(func, *args):
+    """Run a database call from the event loop.
+
+    Event streams bypass Django's request cycle, so stale and broken
+    connections are dropped here, as request_started/finished would do.
+    """
+    def query():
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await sync_to_async(query)()
+
+
+class Event:
+    def __init__(self, name, data, event_id=None):
+        self.name = name
+        self.data = data
+        self.event_id = event_id
+
+    def encode(self):
+        lines = [f'event: {self.name}']
+        if self.event_id is not None:
+            lines.append(f'id: {self.event_id}')
+        lines.append(f'data: {json.dumps(self.data)}')
+        return ('\n'.join(lines) + '\n\n').encode()
+
+
+class Subscription:
+    def __init__(self, question_id, loop, queue_size):
+        self.question_id = question_id
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def push(self, event):
+        # Called on the subscriber's loop thread
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client, drop the event instead of buffering without bound
+            pass
+
+
+class TopicState:
+    """Last published answer and ratings of a question, used to drop duplicate events"""
+
+    def __init__(self):
+        self.last_answer_id = None
+        self.ratings = {}  # (kind, object id) -> rating
+
+
+class QuestionEventHub:
+    """In-process pub/sub of new answers and rating changes, one topic per question.
+
+    Publishing is thread-safe and costs nothing for questions nobody listens to.
+    While a question has subscribers, a single polling task per process also
+    picks up changes made by other workers from the database.
+    """
+
+    def __init__(self, queue_size=None, poll_interval=None):
+        self.queue_size = queue_size or getattr(settings, 'QUESTION_EVENTS_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.poll_interval = poll_interval or getattr(settings, 'QUESTION_EVENTS_POLL_INTERVAL',
+                                                      DEFAULT_POLL_INTERVAL)
+        self._lock = Lock()
+        self._subscriptions = {}  # question_id -> set of subscriptions
+        self._states = {}  # question_id -> TopicState
+        self._pollers = {}  # question_id -> asyncio task
+
+    def subscribe(self, question_id):
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(question_id, loop, self.queue_size)
+        with self._lock:
+            if question_id not in self._subscriptions:
+                self._subscriptions[question_id] = set()
+                self._states[question_id] = TopicState()
+            self._subscriptions[question_id].add(subscription)
+            if self.poll_interval and question_id not in self._pollers:
+                self._pollers[question_id] = loop.create_task(self._poll(question_id))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        question_id = subscription.question_id
+        with self._lock:
+            subscriptions = self._subscriptions.get(question_id, set())
+            subscriptions.discard(subscription)
+            if subscriptions:
+                return
+            self._subscriptions.pop(question_id, None)
+            self._states.pop(question_id, None)
+            poller = self._pollers.pop(question_id, None)
+        if poller:
+            poller.cancel()
+
+    def _broadcast(self, question_id, event):
+        # Must be called with the lock held
+        for subscription in self._subscriptions.get(question_id, ()):
+            subscription.loop.call_soon_threadsafe(subscription.push, event)
+
+    def publish_answer(self, question_id, answer_id, data):
+        with self._lock:
+            state = self._states.get(question_id)
+            if state is None:
+                return
+            if state.last_answer_id is not None and answer_id <= state.last_answer_id:
+                return
+            state.last_answer_id = answer_id
+            state.ratings[('answer', answer_id)] = data['rating']
+            self._broadcast(question_id, Event('answer', data, event_id=answer_id))
+
+    def publish_rating(self, question_id, kind, object_id, rating):
+        with self._lock:
+            state = self._states.get(question_id)
+            if state is None or state.ratings.get((kind, object_id)) == rating:
+                return
+            state.ratings[(kind, object_id)] = rating
+            self._broadcast(question_id, Event('rating', {'type': kind, 'id': object_id, 'rating': rating}))
+
+    def _set_baseline(self, question_id, last_answer_id, ratings):
+        with self._lock:
+            state = self._states.get(question_id)
+            if state is None:
+                return
+            if state.last_answer_id is None or state.last_answer_id < last_answer_id:
+                state.last_answer_id = last_answer_id
+            for key, rating in ratings.items():
+                state.ratings.setdefault(key, rating)
+
+    async def _poll(self, question_id):
+        last_answer_id = None
+        while True:
+            try:
+                if last_answer_id is None:
+                    last_answer_id, ratings = await run_query(self._load_snapshot, question_id)
+                    self._set_baseline(question_id, last_answer_id, ratings)
+                else:
+                    new_answers, ratings = await run_query(self._load_changes, question_id, last_answer_id)
+                    for answer in new_answers:
+                        self.publish_answer(question_id, answer.pk, answer_event_data(answer))
+                        last_answer_id = answer.pk
+                    for (kind, object_id), rating in ratings.items():
+                        self.publish_rating(question_id, kind, object_id, rating)
+            except Exception:
+                # Keep the task alive, it is the only source of changes made by other workers
+                logger.exception('Failed to poll question #%s for events', question_id)
+            await asyncio.sleep(self.poll_interval)
+
+    @staticmethod
+    def _load_ratings(question_id):
+        question_model = apps.get_model('app', 'Question')
+        answer_model = apps.get_model('app', 'Answer')
+        ratings = {('answer', pk): rating for pk, rating in
+                   answer_model.objects.filter(question_id=question_id).values_list('pk', 'rating')}
+        for rating in question_model.objects.filter(pk=question_id).values_list('rating', flat=True):
+            ratings[('question', question_id)] = rating
+        return ratings
+
+    def _load_snapshot(self, question_id):
+        ratings = self._load_ratings(question_id)
+        answer_ids = [object_id for kind, object_id in ratings if kind == 'answer']
+        return max(answer_ids, default=0), ratings
+
+    def _load_changes(self, question_id, last_answer_id):
+        answer_model = apps.get_model('app', 'Answer')
+        new_answers = list(answer_model.objects.filter(question_id=question_id, pk__gt=last_answer_id)
+                           .select_related('author').order_by('pk'))
+        return new_answers, self._load_ratings(question_id)
+
+    def has_subscribers(self, question_id):
+        return question_id in self._subscriptions
+
+
+def answer_event_data(answer):
+    return {
+        'id': answer.pk,
+        'author': answer.author.nickname,
+        'text': answer.text,
+        'rating': answer.rating,
+        'is_right': answer.is_right,
+        'creation_dt': answer.creation_dt.isoformat(),
+    }
+
+
+hub = QuestionEventHub()
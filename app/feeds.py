@@ -0,0 +1,150 @@
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+from email.utils import format_datetime
+from threading import Lock
+from xml.sax.saxutils import escape, quoteattr
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from app.models import Question, Tag
+
+DEFAULT_FEEDS_ITEMS = 50
+DEFAULT_FEEDS_UPDATE_WINDOW = 60  # Seconds a serialized feed is served before it is rebuilt
+FEED_FORMATS = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+}
+
+_build_locks = {}
+_build_locks_guard = Lock()
+
+
+class Feed:
+    def __init__(self, name, title, queryset, link):
+        self.name = name
+        self.title = title
+        self.queryset = queryset
+        self.link = link
+
+    def items(self, since=None):
+        queryset = self.queryset.select_related('author')
+        if since is not None:
+            queryset = queryset.filter(creation_dt__gt=since)
+        limit = getattr(settings, 'FEEDS_ITEMS', DEFAULT_FEEDS_ITEMS)
+        return queryset[:limit].iterator()
+
+    def cache_path(self, feed_format):
+        feeds_dir = getattr(settings, 'FEEDS_CACHE_DIR', settings.BASE_DIR / 'feeds_cache')
+        return os.path.join(feeds_dir, f'{self.name}.{feed_format}')
+
+
+def parse_since(value):
+    """Accept either an ISO 8601 datetime or a unix timestamp"""
+    try:
+        if re.fullmatch(r'\d+(\.\d+)?', value):
+            return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+        since = parse_datetime(value)
+    except (ValueError, OverflowError, OSError):
+        # Invalid dates, or timestamps out of the platform's range
+        return None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def get_feed(feed_name, tag_name=None):
+    if feed_name == 'new':
+        return Feed('new', 'New questions', Question.objects.get_new(), '/')
+    if feed_name == 'hot':
+        return Feed('hot', 'Hot questions', Question.objects.get_hot(), '/hot')
+    # Only existing tags get a cache file, arbitrary names would fill the disk
+    if feed_name == 'tag' and tag_name and re.fullmatch(r'[\w-]+', tag_name) \
+            and Tag.objects.filter(name=tag_name).exists():
+        return Feed(f'tag-{tag_name}', f'Questions tagged {tag_name}',
+                    Question.objects.get_tagged(tag_name).order_by('-creation_dt'), f'/tag/{tag_name}')
+    return None
+
+
+def atom_chunks(feed, items, base_url):
+    yield (f'<?xml version="1.0" encoding="utf-8"?>\n'
+           f'<feed xmlns="http://www.w3.org/2005/Atom">'
+           f'<title>{escape(feed.title)}</title>'
+           f'<link href={quoteattr(base_url + feed.link)}/>'
+           f'<id>{escape(base_url + feed.link)}</id>'
+           f'<updated>{timezone.now().isoformat()}</updated>')
+    for question in items:
+        link = f'{base_url}/question/{question.pk}'
+        yield (f'<entry><title>{escape(question.title)}</title>'
+               f'<link href={quoteattr(link)}/><id>{escape(link)}</id>'
+               f'<updated>{question.creation_dt.isoformat()}</updated>'
+               f'<author><name>{escape(question.author.nickname)}</name></author>'
+               f'<summary>{escape(question.text)}</summary></entry>')
+    yield '</feed>\n'
+
+
+def rss_chunks(feed, items, base_url):
+    yield (f'<?xml version="1.0" encoding="utf-8"?>\n'
+           f'<rss version="2.0"><channel>'
+           f'<title>{escape(feed.title)}</title>'
+           f'<link>{escape(base_url + feed.link)}</link>'
+           f'<description>{escape(feed.title)}</description>'
+           f'<lastBuildDate>{format_datetime(timezone.now())}</lastBuildDate>')
+    for question in items:
+        link = f'{base_url}/question/{question.pk}'
+        yield (f'<item><title>{escape(question.title)}</title>'
+               f'<link>{escape(link)}</link><guid>{escape(link)}</guid>'
+               f'<pubDate>{format_datetime(question.creation_dt)}</pubDate>'
+               f'<description>{escape(question.text)}</description></item>')
+    yield '</channel></rss>\n'
+
+
+def site_url():
+    # The cached file is shared by all requests, so links never come from the Host header
+    return getattr(settings, 'FEEDS_SITE_URL', '').rstrip('/')
+
+
+def feed_chunks(feed, feed_format, since=None):
+    chunks = atom_chunks if feed_format == 'atom' else rss_chunks
+    for chunk in chunks(feed, feed.items(since), site_url()):
+        yield chunk.encode()
+
+
+def _build_lock(path):
+    with _build_locks_guard:
+        return _build_locks.setdefault(path, Lock())
+
+
+def is_fresh(path):
+    try:
+        age = time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return False
+    return age < getattr(settings, 'FEEDS_UPDATE_WINDOW', DEFAULT_FEEDS_UPDATE_WINDOW)
+
+
+def build_feed_file(feed, feed_format):
+    """Serialize the feed to its cache file, at most once per update window"""
+    path = feed.cache_path(feed_format)
+    if is_fresh(path):
+        return path
+    with _build_lock(path):
+        # Another thread might have rebuilt it while we were waiting
+        if is_fresh(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in feed_chunks(feed, feed_format):
+                    tmp_file.write(chunk)
+            os.chmod(tmp_path, 0o644)
+            # Readers always see either the old or the new file, never a partial one
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return path
+
@@ -0,0 +1,142 @@
+import time
+from bisect import insort
+from collections import Counter, defaultdict
+from threading import RLock
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count
+
+DEFAULT_LEADERBOARD_SIZE = 10
+DEFAULT_BUCKET_WIDTH = 10
+DEFAULT_RELOAD_INTERVAL = 60  # Seconds
+
+
+class Leaderboard:
+    """In-memory top profiles by reputation plus a reputation histogram for rank lookups.
+
+    The structure is loaded from the database and then kept up to date with
+    reputation deltas coming from the vote path of this process. It is per
+    process, changes made by other workers show up after the next periodic
+    reload (LEADERBOARD_RELOAD_INTERVAL).
+    """
+
+    def __init__(self, size=None, bucket_width=None, reload_interval=None):
+        self.size = size or getattr(settings, 'LEADERBOARD_SIZE', DEFAULT_LEADERBOARD_SIZE)
+        self.bucket_width = bucket_width or getattr(settings, 'LEADERBOARD_BUCKET_WIDTH', DEFAULT_BUCKET_WIDTH)
+        # Deltas only reach the process which handled the vote, so every worker
+        # reloads from the database periodically to pick up the others
+        self.reload_interval = reload_interval or getattr(settings, 'LEADERBOARD_RELOAD_INTERVAL',
+                                                          DEFAULT_RELOAD_INTERVAL)
+        # Keep more entries than displayed, so members dropping out of the top
+        # can be replaced without going back to the database
+        self.capacity = self.size * 2
+        self._lock = RLock()
+        self._loaded_at = None
+        self._top = []  # Sorted list of (-reputation, profile_id)
+        self._members = {}  # profile_id -> reputation, for profiles in self._top
+        self._buckets = defaultdict(Counter)  # bucket -> {reputation: profiles count}
+        self._bucket_totals = Counter()  # bucket -> profiles count
+        self._profiles_total = 0
+
+    def _bucket(self, reputation):
+        return reputation // self.bucket_width
+
+    def _hist_add(self, reputation, count=1):
+        bucket = self._bucket(reputation)
+        if count < 0 and self._buckets.get(bucket, {}).get(reputation, 0) < -count:
+            # A profile this process has not loaded yet, e.g. created by another worker
+            return
+        self._buckets[bucket][reputation] += count
+        self._bucket_totals[bucket] += count
+        self._profiles_total += count
+        if self._buckets[bucket][reputation] == 0:
+            del self._buckets[bucket][reputation]
+        if not self._buckets[bucket]:
+            del self._buckets[bucket]
+            del self._bucket_totals[bucket]
+
+    def _load_top(self):
+        profile_model = apps.get_model('app', 'Profile')
+        rows = profile_model.objects.order_by('-reputation', 'pk').values_list('pk', 'reputation')
+        self._top = [(-reputation, pk) for pk, reputation in rows[:self.capacity]]
+        self._members = {pk: -neg_reputation for neg_reputation, pk in self._top}
+
+    def load(self):
+        profile_model = apps.get_model('app', 'Profile')
+        with self._lock:
+            self._buckets.clear()
+            self._bucket_totals.clear()
+            self._profiles_total = 0
+            reputations = profile_model.objects.values('reputation').annotate(count=Count('pk')).order_by()
+            for row in reputations:
+                self._hist_add(row['reputation'], row['count'])
+            self._load_top()
+            self._loaded_at = time.monotonic()
+
+    def _is_loaded(self):
+        return self._loaded_at is not None
+
+    def _ensure_loaded(self):
+        if not self._is_loaded() or time.monotonic() - self._loaded_at > self.reload_interval:
+            self.load()
+
+    def reset(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_complete(self):
+        # The window holds every profile, so there is nobody outside it to miss
+        return len(self._top) >= self._profiles_total
+
+    def add_profile(self, profile_id, reputation=0):
+        with self._lock:
+            if not self._is_loaded():
+                return
+            complete = self._is_complete()
+            self._hist_add(reputation)
+            self._place(profile_id, reputation, complete)
+
+    def update(self, profile_id, reputation, delta):
+        with self._lock:
+            if not self._is_loaded() or not delta:
+                return
+            complete = self._is_complete()
+            self._hist_add(reputation - delta, -1)
+            self._hist_add(reputation)
+            if profile_id in self._members:
+                self._top.remove((-self._members.pop(profile_id), profile_id))
+            self._place(profile_id, reputation, complete)
+
+    def _place(self, profile_id, reputation, complete):
+        entry = (-reputation, profile_id)
+        # Unless the window holds everybody, profiles outside it may sort between
+        # its last member and an entry past the end, so such an entry is left out
+        if complete or (self._top and entry < self._top[-1]):
+            insort(self._top, entry)
+            self._members[profile_id] = reputation
+            if len(self._top) > self.capacity:
+                _, dropped_id = self._top.pop()
+                del self._members[dropped_id]
+        if len(self._top) < min(self.size, self._profiles_total):
+            # Too many members dropped out, the window no longer covers the top
+            self._load_top()
+
+    def top_ids(self, count):
+        with self._lock:
+            self._ensure_loaded()
+            if count > self.capacity:
+                # More than the window holds, grow it from the indexed column
+                self.capacity = count
+                self._load_top()
+            return [pk for _, pk in self._top[:count]]
+
+    def rank(self, reputation):
+        with self._lock:
+            self._ensure_loaded()
+            bucket = self._bucket(reputation)
+            higher = sum(total for b, total in self._bucket_totals.items() if b > bucket)
+            higher += sum(count for r, count in self._buckets.get(bucket, {}).items() if r > reputation)
+            return higher + 1
+
+
+leaderboard = Leaderboard()
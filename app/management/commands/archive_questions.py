@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from app.models import Question
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+DEFAULT_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Move closed and old questions with their answers and likes to the archive tables'
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('-d', '--days', type=int,
+                            help='Archive questions created more than this number of days ago')
+        parser.add_argument('-m', '--max_hot', type=int,
+                            help='Archive the oldest questions beyond this number of hot questions')
+        parser.add_argument('-b', '--batch_size', type=int, help='Indicates the number of questions moved at once')
+
+    def archive(self, queryset, batch_size, limit=None):
+        total = 0
+        while limit is None or total < limit:
+            # Archived rows leave the hot table, so the queryset yields the next batch each time
+            size = batch_size if limit is None else min(batch_size, limit - total)
+            question_ids = list(queryset.values_list('pk', flat=True)[:size])
+            if not question_ids:
+                break
+            total += Question.objects.archive(question_ids)
+            print(f'{total} questions archived')
+        return total
+
+    def handle(self, *args, **options):
+        days = options['days'] if (options['days'] is not None) \
+            else getattr(settings, 'ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+        max_hot = options['max_hot'] if (options['max_hot'] is not None) \
+            else getattr(settings, 'ARCHIVE_MAX_HOT_QUESTIONS', None)
+        batch_size = options['batch_size'] if (options['batch_size'] is not None) else DEFAULT_BATCH_SIZE
+
+        print(f'Archiving closed questions and questions older than {days} days')
+        created_before = timezone.now() - timedelta(days=days)
+        total = self.archive(Question.objects.get_stale(created_before).order_by('pk'), batch_size)
+
+        if max_hot is not None:
+            print(f'Archiving the oldest questions beyond {max_hot} hot ones')
+            overflow = Question.objects.count() - max_hot
+            if overflow > 0:
+                oldest = Question.objects.order_by('creation_dt', 'pk')
+                total += self.archive(oldest, batch_size, limit=overflow)
+
+        print(f'Archive done, {total} questions moved')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.counters import recount, counters_shared
+
+
+class Command(BaseCommand):
+    help = 'Set exact question, tag and answer counters from the database'
+    requires_migrations_checks = True
+
+    def handle(self, *args, **options):
+        if not counters_shared():
+            raise CommandError('COUNTERS_CACHE is a local-memory cache, the counters would only '
+                               'live in this command. Point it to a cache shared by the workers')
+        print('Counting questions, tags and answers')
+        recount()
+        print('Counters updated')
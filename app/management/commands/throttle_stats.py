@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.throttling import throttle
+
+
+class Command(BaseCommand):
+    help = 'Show the number of throttled requests per scope'
+
+    def handle(self, *args, **options):
+        if not throttle.cache_alias:
+            raise CommandError('Rejections are only counted inside each web process, '
+                               'set THROTTLE_CACHE to collect them from all workers')
+        for scope, rejected in sorted(throttle.get_rejections().items()):
+            print(f'{scope}: {rejected} rejected')
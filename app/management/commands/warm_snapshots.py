@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count
+from app.models import Question, Tag
+from app.snapshots import write_snapshot, question_path, tag_path
+
+DEFAULT_QUESTIONS_TOTAL = 100
+DEFAULT_TAGS_TOTAL = 20
+DEFAULT_WORKERS = 4
+
+
+def write_snapshot_in_thread(path):
+    try:
+        return write_snapshot(path)
+    except Exception as e:
+        print(f'Failed to render {path}: {e!r}')
+        return False
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Pre-render snapshots of the main page, hot questions and popular tags for anonymous readers'
+    requires_migrations_checks = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('-q', '--questions', type=int, help='Indicates the number of hot questions to render')
+        parser.add_argument('-t', '--tags', type=int, help='Indicates the number of popular tags to render')
+        parser.add_argument('-w', '--workers', type=int, help='Indicates the number of pages rendered in parallel')
+
+    def handle(self, *args, **options):
+        questions_total = options['questions'] if (options['questions'] is not None) else DEFAULT_QUESTIONS_TOTAL
+        tags_total = options['tags'] if (options['tags'] is not None) else DEFAULT_TAGS_TOTAL
+        workers = options['workers'] if (options['workers'] is not None) else DEFAULT_WORKERS
+
+        paths = ['/']
+        question_ids = Question.objects.get_hot().values_list('pk', flat=True)[:questions_total]
+        paths += [question_path(pk) for pk in question_ids]
+        tag_names = Tag.objects.annotate(questions=Count('question')).order_by('-questions') \
+            .values_list('name', flat=True)[:tags_total]
+        paths += [tag_path(name) for name in tag_names]
+
+        print(f'Rendering {len(paths)} snapshots with {workers} workers')
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(write_snapshot_in_thread, paths))
+        print(f'{written} snapshots written')
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=30, unique=True)),
+                ('reputation', models.IntegerField(db_index=True, default=0)),
+                ('avatar', models.ImageField(upload_to='uploads')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(db_index=True)),
+                ('is_positive', models.BooleanField(default=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.profile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=140)),
+                ('text', models.CharField(max_length=1000)),
+                ('creation_dt', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('rating', models.IntegerField(db_index=True, default=0)),
+                ('is_open', models.BooleanField(default=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.profile')),
+                ('tags', models.ManyToManyField(blank=True, to='app.tag')),
+            ],
+            options={
+                'ordering': ['-creation_dt'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Answer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=1000)),
+                ('rating', models.IntegerField(default=0)),
+                ('creation_dt', models.DateTimeField(auto_now_add=True)),
+                ('is_right', models.BooleanField(default=False)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.profile')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.question')),
+            ],
+            options={
+                'ordering': ['-rating'],
+            },
+        ),
+    ]
@@ -1,25 +1,30 @@
 from os import path
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.exceptions import ValidationError, FieldError
 from django.contrib.auth.models import User
+from app.leaderboard import leaderboard
 
 
 class ProfileManager(models.Manager):
     def get_top(self, count):
-        return self.order_by('-reputation')[:count]
+        top_ids = leaderboard.top_ids(count)
+        profiles = self.in_bulk(top_ids)
+        return [profiles[pk] for pk in top_ids if pk in profiles]
 
     def create_profile(self, username, email, nickname, password, avatar=None):
         user = User.objects.create_user(username, email, password)
-        return self.create(user=user, nickname=nickname, avatar=avatar)
+        profile = self.create(user=user, nickname=nickname, avatar=avatar)
+        leaderboard.add_profile(profile.pk, profile.reputation)
+        return profile
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     nickname = models.CharField(max_length=30, unique=True)
-    reputation = models.IntegerField(default=0)
+    reputation = models.IntegerField(default=0, db_index=True)
     avatar = models.ImageField(upload_to='uploads')
     objects = ProfileManager()
 
@@ -43,6 +48,10 @@ class Profile(models.Model):
         if profile_modified:
             self.save()
 
+    @property
+    def rank(self):
+        return leaderboard.rank(self.reputation)
+
     def __str__(self):
         return self.nickname
 
@@ -64,6 +73,7 @@ class LikeManager(models.Manager):
         if rating_delta:
             content_object.author.reputation += rating_delta
             content_object.author.save()
+            leaderboard.update(content_object.author.pk, content_object.author.reputation, rating_delta)
             content_object.rating += rating_delta
             content_object.save()
         return content_object.rating
@@ -140,6 +150,52 @@ class QuestionManager(models.Manager):
         q.add_tags(tag_names)
         return q
 
+    def get_or_archived(self, pk):
+        try:
+            return self.get(pk=pk)
+        except self.model.DoesNotExist:
+            pass
+        try:
+            return ArchivedQuestion.objects.get(pk=pk)
+        except ArchivedQuestion.DoesNotExist:
+            raise self.model.DoesNotExist(f'Question #{pk} does not exist')
+
+    def get_stale(self, created_before):
+        return self.filter(models.Q(is_open=False) | models.Q(creation_dt__lt=created_before))
+
+    def archive(self, question_ids, batch_size=1000):
+        """Move questions with their tags, answers and likes into the archive tables"""
+        question_type = ContentType.objects.get_for_model(Question)
+        answer_type = ContentType.objects.get_for_model(Answer)
+        archived_types = {
+            question_type.pk: ContentType.objects.get_for_model(ArchivedQuestion),
+            answer_type.pk: ContentType.objects.get_for_model(ArchivedAnswer),
+        }
+        with transaction.atomic():
+            questions = list(self.filter(pk__in=question_ids))
+            question_ids = [q.pk for q in questions]
+            answers = Answer.objects.filter(question_id__in=question_ids)
+            likes = Like.objects.filter(
+                models.Q(content_type=question_type, object_id__in=question_ids) |
+                models.Q(content_type=answer_type, object_id__in=answers.values('pk')))
+            question_tags = Question.tags.through.objects.filter(question_id__in=question_ids)
+
+            ArchivedQuestion.objects.bulk_create(
+                [ArchivedQuestion.from_question(q) for q in questions], batch_size)
+            ArchivedQuestion.tags.through.objects.bulk_create(
+                [ArchivedQuestion.tags.through(archivedquestion_id=question_id, tag_id=tag_id)
+                 for question_id, tag_id in question_tags.values_list('question_id', 'tag_id')], batch_size)
+            ArchivedAnswer.objects.bulk_create(
+                [ArchivedAnswer.from_answer(a) for a in answers.iterator()], batch_size)
+            ArchivedLike.objects.bulk_create(
+                [ArchivedLike(content_type=archived_types[like.content_type_id], object_id=like.object_id,
+                              author_id=like.author_id, is_positive=like.is_positive)
+                 for like in likes.iterator()], batch_size)
+
+            likes.delete()
+            self.filter(pk__in=question_ids).delete()
+        return len(question_ids)
+
 
 class Question(models.Model):
     author = models.ForeignKey(Profile, on_delete=models.CASCADE)
@@ -150,6 +206,7 @@ class Question(models.Model):
     creation_dt = models.DateTimeField(auto_now_add=True, db_index=True)
     rating = models.IntegerField(default=0, db_index=True)
     is_open = models.BooleanField(default=True)
+    is_archived = False
 
     objects = QuestionManager()
 
@@ -198,3 +255,61 @@ class Answer(models.Model):
 
     class Meta:
         ordering = ['-rating']
+
+
+class ArchivedLike(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField(db_index=True)
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='archived_likes')
+    is_positive = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f'#{self.object_id} {self.author} ({self.is_positive})'
+
+
+class ArchivedQuestion(models.Model):
+    """Closed or stale question, read-only copy keeping the primary key of the original"""
+    author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='archived_questions')
+    title = models.CharField(max_length=140)
+    text = models.CharField(max_length=1000)
+    tags = models.ManyToManyField(Tag, blank=True, related_name='archived_questions')
+    likes = GenericRelation(ArchivedLike)
+    creation_dt = models.DateTimeField()
+    archive_dt = models.DateTimeField(auto_now_add=True)
+    rating = models.IntegerField(default=0)
+    is_open = models.BooleanField(default=False)
+    is_archived = True
+
+    def __str__(self):
+        return self.title
+
+    @classmethod
+    def from_question(cls, question):
+        return cls(pk=question.pk, author_id=question.author_id, title=question.title, text=question.text,
+                   creation_dt=question.creation_dt, rating=question.rating, is_open=question.is_open)
+
+    class Meta:
+        ordering = ['-creation_dt']
+
+
+class ArchivedAnswer(models.Model):
+    question = models.ForeignKey(ArchivedQuestion, on_delete=models.CASCADE, related_name='answer_set')
+    author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='archived_answers')
+    text = models.CharField(max_length=1000)
+    rating = models.IntegerField(default=0)
+    likes = GenericRelation(ArchivedLike)
+    creation_dt = models.DateTimeField()
+    is_right = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'#{self.question} by {self.author}'
+
+    @classmethod
+    def from_answer(cls, answer):
+        return cls(pk=answer.pk, question_id=answer.question_id, author_id=answer.author_id, text=answer.text,
+                   creation_dt=answer.creation_dt, rating=answer.rating, is_right=answer.is_right)
+
+    class Meta:
+        ordering = ['-rating']
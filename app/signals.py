@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from app import counters
+from app.events import hub, answer_event_data
+from app.models import Question, Answer, Tag
+from app.snapshots import snapshot_queue, snapshots_enabled, question_path, tag_path
+
+
+@receiver(post_save, sender=Answer)
+def publish_answer(sender, instance, created, **kwargs):
+    if not hub.has_subscribers(instance.question_id):
+        return
+    # Rolled back writes must not reach the listeners
+    if created:
+        data = answer_event_data(instance)
+        transaction.on_commit(lambda: hub.publish_answer(instance.question_id, instance.pk, data))
+    else:
+        rating = instance.rating
+        transaction.on_commit(lambda: hub.publish_rating(instance.question_id, 'answer', instance.pk, rating))
+
+
+@receiver(post_save, sender=Question)
+def publish_question_rating(sender, instance, created, **kwargs):
+    if not created and hub.has_subscribers(instance.pk):
+        rating = instance.rating
+        transaction.on_commit(lambda: hub.publish_rating(instance.pk, 'question', instance.pk, rating))
+
+
+@receiver(post_save, sender=Question)
+def count_question_created(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_counter(counters.QUESTIONS_KEY, 1)
+        counters.set_counter(counters.answers_key(instance.pk), 0)
+
+
+@receiver(pre_delete, sender=Question)
+def count_question_deleted(sender, instance, **kwargs):
+    counters.add_to_counter(counters.QUESTIONS_KEY, -1)
+    for tag_name in instance.tags.values_list('name', flat=True):
+        counters.add_to_counter(counters.tag_key(tag_name), -1)
+
+
+@receiver(post_delete, sender=Question)
+def drop_question_counters(sender, instance, **kwargs):
+    counters.drop_counter(counters.answers_key(instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+def count_tag_created(sender, instance, created, **kwargs):
+    if created:
+        counters.set_counter(counters.tag_key(instance.name), 0)
+
+
+@receiver(post_delete, sender=Tag)
+def drop_tag_counter(sender, instance, **kwargs):
+    counters.drop_counter(counters.tag_key(instance.name))
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def count_question_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is not provided on clear, remember what is about to be removed
+        instance._cleared_tags = list(sender.objects.filter(**{
+            'tag_id' if reverse else 'question_id': instance.pk}).values_list('tag__name', flat=True))
+        return
+    if action == 'post_clear':
+        for tag_name in getattr(instance, '_cleared_tags', ()):
+            counters.add_to_counter(counters.tag_key(tag_name), -1)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    delta = 1 if action == 'post_add' else (-1)
+    if reverse:
+        counters.add_to_counter(counters.tag_key(instance.name), delta * len(pk_set))
+    else:
+        for tag_name in Tag.objects.filter(pk__in=pk_set).values_list('name', flat=True):
+            counters.add_to_counter(counters.tag_key(tag_name), delta)
+
+
+@receiver(post_save, sender=Answer)
+def count_answer_created(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_counter(counters.answers_key(instance.question_id), 1)
+
+
+@receiver(post_delete, sender=Answer)
+def count_answer_deleted(sender, instance, **kwargs):
+    counters.add_to_counter(counters.answers_key(instance.question_id), -1)
+
+
+def schedule_snapshots(*paths):
+    # Render once the change is visible to the snapshot worker's connection
+    transaction.on_commit(lambda: snapshot_queue.schedule(*paths))
+
+
+@receiver(post_save, sender=Question)
+def snapshot_question_saved(sender, instance, created, **kwargs):
+    if snapshots_enabled():
+        tag_paths = [tag_path(name) for name in instance.tags.values_list('name', flat=True)]
+        schedule_snapshots(question_path(instance.pk), '/', *tag_paths)
+
+
+@receiver(pre_delete, sender=Question)
+def snapshot_question_deleted(sender, instance, **kwargs):
+    if snapshots_enabled():
+        tag_paths = [tag_path(name) for name in instance.tags.values_list('name', flat=True)]
+        schedule_snapshots(question_path(instance.pk), '/', *tag_paths)
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def snapshot_question_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not snapshots_enabled() or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        question_ids = pk_set or ()
+        tag_names = [instance.name]
+    else:
+        question_ids = [instance.pk]
+        if action == 'post_clear':
+            tag_names = getattr(instance, '_cleared_tags', ())
+        else:
+            tag_names = Tag.objects.filter(pk__in=pk_set or ()).values_list('name', flat=True)
+    schedule_snapshots(*[question_path(pk) for pk in question_ids], *[tag_path(name) for name in tag_names])
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def snapshot_answers_changed(sender, instance, **kwargs):
+    if snapshots_enabled():
+        schedule_snapshots(question_path(instance.question_id))
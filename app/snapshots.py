@@ -0,0 +1,139 @@
+import gzip
+import logging
+import os
+import queue
+import re
+import tempfile
+from threading import Lock, Thread
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.http import Http404, HttpRequest
+from django.urls import resolve, Resolver404
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = re.compile(r'^/(question/\d+|tag/[\w-]+)?$')
+
+
+def snapshots_enabled():
+    return getattr(settings, 'SNAPSHOTS_ENABLED', False)
+
+
+def snapshot_file(path):
+    """File a front server looks up for the path, e.g. /question/5 -> <dir>/question/5.html"""
+    snapshots_dir = getattr(settings, 'SNAPSHOTS_DIR', settings.BASE_DIR / 'snapshots')
+    return os.path.join(snapshots_dir, (path.strip('/') or 'index') + '.html')
+
+
+def question_path(question_id):
+    return f'/question/{question_id}'
+
+
+def tag_path(tag_name):
+    return f'/tag/{tag_name}'
+
+
+def render_anonymous(path):
+    """Render the page exactly as an anonymous reader gets it, None if it is not a plain 200 page"""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    req = HttpRequest()
+    req.method = 'GET'
+    req.path = req.path_info = path
+    req.META['SERVER_NAME'] = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+    req.META['SERVER_PORT'] = '80'
+    req.user = AnonymousUser()
+    # The view is called without the handler, which would turn exceptions into error pages
+    try:
+        response = match.func(req, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    except Exception:
+        logger.exception('Failed to render snapshot of %s', path)
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    if response.status_code != 200 or response.streaming:
+        return None
+    return response.content
+
+
+def _write_atomic(file_path, content):
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _remove(file_path):
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def write_snapshot(path):
+    """Render the path and store it with a pre-compressed copy, or remove stale files"""
+    if not SNAPSHOT_PATH.match(path):
+        return False
+    file_path = snapshot_file(path)
+    content = render_anonymous(path)
+    if content is None:
+        _remove(file_path + '.gz')
+        _remove(file_path)
+        return False
+    # Compressed copy goes first, so the plain file never points to an outdated .gz
+    _write_atomic(file_path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    _write_atomic(file_path, content)
+    return True
+
+
+class SnapshotQueue:
+    """Background regeneration of snapshots, a path waiting in the queue is scheduled only once"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = Lock()
+        self._worker = None
+
+    def schedule(self, *paths):
+        if not snapshots_enabled():
+            return
+        with self._lock:
+            for path in paths:
+                if path not in self._pending:
+                    self._pending.add(path)
+                    self._queue.put(path)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = Thread(target=self._run, name='snapshots', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            with self._lock:
+                self._pending.discard(path)
+            try:
+                write_snapshot(path)
+            except Exception:
+                logger.exception('Failed to write snapshot of %s', path)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def join(self):
+        self._queue.join()
+
+
+snapshot_queue = SnapshotQueue()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import re
+from app.events import hub, run_query
+from app.models import Question
+
+logger = logging.getLogger(__name__)
+
+QUESTION_EVENTS_PATH = re.compile(r'^/question/(?P<question_id>\d+)/events$')
+KEEPALIVE_INTERVAL = 15  # Seconds between comments keeping idle connections open
+
+
+async def send_plain(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def question_exists(question_id):
+    return Question.objects.filter(pk=question_id).exists()
+
+
+async def wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def question_events(scope, receive, send, question_id):
+    """Stream new answers and rating changes of a question as server-sent events.
+
+    Each connection is a single coroutine waiting on its subscription queue.
+    Archived questions no longer change, so they have no stream and get a 404.
+    """
+    if scope['method'] != 'GET':
+        await send_plain(send, 405, b'Method not allowed')
+        return
+    try:
+        exists = await run_query(question_exists, question_id)
+    except Exception:
+        logger.exception('Failed to look up question #%s for events', question_id)
+        await send_plain(send, 503, b'Service unavailable, try again later')
+        return
+    if not exists:
+        await send_plain(send, 404, b'Question not found')
+        return
+
+    subscription = hub.subscribe(question_id)
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({next_event, disconnected}, timeout=KEEPALIVE_INTERVAL,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_event in done:
+                body = next_event.result().encode()
+            else:
+                next_event.cancel()
+                if disconnected in done:
+                    break
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    except OSError:
+        # Client went away while we were writing
+        pass
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(subscription)
+
+
+def events_application(django_application):
+    """Wrap the Django ASGI application, serving event streams without a thread per connection"""
+    async def application(scope, receive, send):
+        if scope['type'] == 'http':
+            match = QUESTION_EVENTS_PATH.match(scope['path'])
+            if match:
+                await question_events(scope, receive, send, int(match.group('question_id')))
+                return
+        await django_application(scope, receive, send)
+    return application
@@ -1,3 +1,393 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from app import counters
+from app.events import hub
+from app.leaderboard import Leaderboard
+from app.snapshots import snapshot_file, write_snapshot
+from app.sse import events_application
+from app.models import Profile, Question, Answer, ArchivedQuestion
+from app.throttling import client_ip, throttle, throttle_view
+
+# Keep the shared counters of the project out of the tests, CountersTest sets up its own
+local_counters = override_settings(COUNTERS_CACHE='default')
+
+
+def create_profile(number, reputation):
+    user = User.objects.create(username=f'user{number}', email=f'user{number}@example.com')
+    return Profile.objects.create(user=user, nickname=f'nick{number}', reputation=reputation)
+
+
+@local_counters
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        # Reputations 100..71, window of 6 profiles
+        self.profiles = [create_profile(i, 100 - i) for i in range(30)]
+        self.leaderboard = Leaderboard(size=3, bucket_width=10)
+        self.leaderboard.load()
+
+    def set_reputation(self, profile, reputation):
+        delta = reputation - profile.reputation
+        profile.reputation = reputation
+        profile.save()
+        self.leaderboard.update(profile.pk, reputation, delta)
+
+    def expected_top(self, count):
+        return list(Profile.objects.order_by('-reputation', 'pk').values_list('pk', flat=True)[:count])
+
+    def test_demotion(self):
+        for profile in self.profiles[:4]:
+            self.set_reputation(profile, 0)
+        self.assertEqual(self.leaderboard.top_ids(3), self.expected_top(3))
+
+    def test_promotion(self):
+        self.set_reputation(self.profiles[-1], 500)
+        self.set_reputation(self.profiles[-2], 99)
+        self.assertEqual(self.leaderboard.top_ids(3), self.expected_top(3))
+
+    def test_demotion_then_promotion(self):
+        self.set_reputation(self.profiles[0], 0)
+        self.set_reputation(self.profiles[0], 1000)
+        self.set_reputation(self.profiles[20], 95)
+        self.assertEqual(self.leaderboard.top_ids(3), self.expected_top(3))
+
+    def test_ties(self):
+        self.set_reputation(self.profiles[1], 100)
+        self.set_reputation(self.profiles[10], 100)
+        # Equal reputation is ordered by primary key, as in the database
+        self.assertEqual(self.leaderboard.top_ids(3), self.expected_top(3))
+        self.assertEqual(self.leaderboard.rank(100), 1)
+
+    def test_rank(self):
+        self.set_reputation(self.profiles[5], 97)
+        self.set_reputation(self.profiles[29], 20)
+        for profile in self.profiles:
+            expected = Profile.objects.filter(reputation__gt=profile.reputation).count() + 1
+            self.assertEqual(self.leaderboard.rank(profile.reputation), expected)
+
+    def test_vote_for_unknown_profile(self):
+        create_profile(100, 5)
+        self.leaderboard.load()
+        # Created by another worker, this leaderboard only hears about the vote
+        self.set_reputation(create_profile(101, 0), 1)
+        for reputation in (80, 5, 4, 1, 0):
+            expected = Profile.objects.filter(reputation__gt=reputation).count() + 1
+            self.assertEqual(self.leaderboard.rank(reputation), expected)
+
+    def test_new_profile(self):
+        profile = create_profile(100, 0)
+        self.leaderboard.add_profile(profile.pk, profile.reputation)
+        self.set_reputation(profile, 200)
+        self.assertEqual(self.leaderboard.top_ids(3), self.expected_top(3))
+        self.assertEqual(self.leaderboard.rank(200), 1)
+
+
+class ThrottleTest(SimpleTestCase):
+    def request(self, remote_addr, forwarded_for=None):
+        req = RequestFactory().post('/ask', REMOTE_ADDR=remote_addr)
+        if forwarded_for:
+            req.META['HTTP_X_FORWARDED_FOR'] = forwarded_for
+        req.user = AnonymousUser()
+        return req
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=['10.0.0.1'])
+    def test_client_ip(self):
+        self.assertEqual(client_ip(self.request('10.0.0.1', '1.2.3.4')), '1.2.3.4')
+        # A client can prepend anything, only the address added by our proxy counts
+        self.assertEqual(client_ip(self.request('10.0.0.1', '6.6.6.6, 1.2.3.4')), '1.2.3.4')
+        self.assertEqual(client_ip(self.request('5.6.7.8', '1.2.3.4')), '5.6.7.8')
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=['10.0.0.1'])
+    def test_rejects_over_rate(self):
+        view = throttle_view('ask')(lambda req: HttpResponse('ok'))
+        capacity, _ = throttle.rates['ask']
+        rejected_before = throttle.rejections['ask']
+        for _ in range(capacity):
+            self.assertEqual(view(self.request('10.0.0.1', '9.9.9.1')).status_code, 200)
+        response = view(self.request('10.0.0.1', '9.9.9.1'))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(throttle.rejections['ask'], rejected_before + 1)
+        # Other clients behind the same proxy are not affected
+        self.assertEqual(view(self.request('10.0.0.1', '9.9.9.2')).status_code, 200)
+
+
+@local_counters
+class QuestionEventsTest(TestCase):
+    def setUp(self):
+        self.profile = create_profile(1, 0)
+        self.question = Question.objects.create(author=self.profile, title='Title', text='Text')
+        self.loop = asyncio.new_event_loop()
+        self.poll_interval, hub.poll_interval = hub.poll_interval, None
+
+    def tearDown(self):
+        hub.poll_interval = self.poll_interval
+        self.loop.close()
+
+    def received_events(self, action):
+        async def subscribe():
+            return hub.subscribe(self.question.pk)
+        subscription = self.loop.run_until_complete(subscribe())
+        try:
+            action()
+            # Let the loop run the callbacks scheduled by the publisher
+            self.loop.run_until_complete(asyncio.sleep(0))
+            events = []
+            while not subscription.queue.empty():
+                events.append(subscription.queue.get_nowait())
+            return events
+        finally:
+            hub.unsubscribe(subscription)
+
+    def test_answer_published_on_commit(self):
+        def create_answer():
+            with self.captureOnCommitCallbacks(execute=True):
+                Answer.objects.create(question=self.question, author=self.profile, text='Answer')
+        events = self.received_events(create_answer)
+        self.assertEqual([event.name for event in events], ['answer'])
+
+    def test_rolled_back_answer_not_published(self):
+        def create_answer():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        Answer.objects.create(question=self.question, author=self.profile, text='Answer')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.assertEqual(self.received_events(create_answer), [])
+
+
+@local_counters
+class QuestionEventsEndpointTest(TransactionTestCase):
+    def setUp(self):
+        self.profile = create_profile(1, 0)
+        self.question = Question.objects.create(author=self.profile, title='Title', text='Text')
+        self.poll_interval, hub.poll_interval = hub.poll_interval, None
+        self.addCleanup(setattr, hub, 'poll_interval', self.poll_interval)
+
+    def fallback_application(self, scope, receive, send):
+        raise AssertionError('Event streams must not reach the Django application')
+
+    def call(self, path, after_start=None):
+        """Drive the endpoint like an ASGI server, disconnecting once the stream has started"""
+        async def run():
+            messages = []
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message.get('more_body') and message['body'].startswith(b'retry'):
+                    if after_start:
+                        await after_start()
+                elif message.get('more_body'):
+                    disconnect.set()
+
+            application = events_application(self.fallback_application)
+            scope = {'type': 'http', 'method': 'GET', 'path': path}
+            await asyncio.wait_for(application(scope, receive, send), timeout=5)
+            return messages
+        return asyncio.run(run())
+
+    def test_streams_events(self):
+        async def publish():
+            hub.publish_rating(self.question.pk, 'question', self.question.pk, 5)
+        messages = self.call(f'/question/{self.question.pk}/events', after_start=publish)
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), messages[0]['headers'])
+        self.assertIn(b'event: rating', messages[-1]['body'])
+        self.assertFalse(hub.has_subscribers(self.question.pk))
+
+    def test_unknown_question(self):
+        messages = self.call('/question/999/events')
+        self.assertEqual(messages[0]['status'], 404)
+
+    def test_failed_lookup(self):
+        with mock.patch('app.sse.question_exists', side_effect=RuntimeError), self.assertLogs('app.sse', 'ERROR'):
+            messages = self.call(f'/question/{self.question.pk}/events')
+        self.assertEqual(messages[0]['status'], 503)
+
+
+@local_counters
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.profile = create_profile(1, 0)
+        self.question = Question.objects.create_question(self.profile, 'Archived title', 'Text', ['tag'])
+        self.answer = Answer.objects.create(question=self.question, author=self.profile, text='Archived answer')
+        self.question.add_like(create_profile(2, 0))
+
+    def test_archive_moves_rows(self):
+        self.assertEqual(Question.objects.archive([self.question.pk]), 1)
+        self.assertFalse(Question.objects.exists())
+        self.assertFalse(Answer.objects.exists())
+        archived = ArchivedQuestion.objects.get(pk=self.question.pk)
+        self.assertEqual([tag.name for tag in archived.tags.all()], ['tag'])
+        self.assertEqual([answer.pk for answer in archived.answer_set.all()], [self.answer.pk])
+        self.assertEqual(archived.likes.count(), 1)
+
+    def test_question_page_falls_back_to_archive(self):
+        Question.objects.archive([self.question.pk])
+        response = self.client.get(f'/question/{self.question.pk}')
+        self.assertContains(response, 'Archived title')
+        self.assertContains(response, 'Archived answer')
+        self.assertEqual(self.client.get('/question/999').status_code, 404)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        shared_caches = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'counters': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                         'LOCATION': cache_dir.name},
+        }, COUNTERS_CACHE='counters')
+        shared_caches.enable()
+        self.addCleanup(shared_caches.disable)
+        self.profile = create_profile(1, 0)
+        self.questions = [Question.objects.create_question(self.profile, f'Title {i}', 'Text',
+                                                           ['even' if i % 2 else 'odd']) for i in range(5)]
+
+    def cached_counts(self):
+        return [counters.questions_count(), counters.tag_questions_count('even'),
+                counters.tag_questions_count('odd'), counters.answers_count(self.questions[0].pk)]
+
+    def exact_counts(self):
+        return [Question.objects.count(), Question.objects.get_tagged('even').count(),
+                Question.objects.get_tagged('odd').count(), Answer.objects.filter(question=self.questions[0]).count()]
+
+    def test_counters_follow_changes(self):
+        call_command('recount_counters')
+        question = self.questions[0]
+        Answer.objects.create(question=question, author=self.profile, text='Answer')
+        question.add_tags(['even'])
+        self.questions[1].tags.clear()
+        Question.objects.create_question(self.profile, 'New', 'Text', ['odd'])
+        self.questions[2].delete()
+        with self.assertNumQueries(0):
+            cached_counts = self.cached_counts()
+        self.assertEqual(cached_counts, self.exact_counts())
+
+    def test_recount_corrects_drift(self):
+        call_command('recount_counters')
+        counters.get_cache().incr(counters.QUESTIONS_KEY, 3)
+        counters.get_cache().incr(counters.tag_key('even'), -1)
+        call_command('recount_counters')
+        self.assertEqual(self.cached_counts(), self.exact_counts())
+
+    def assert_no_aggregates(self, path):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        self.assertFalse([query['sql'] for query in context.captured_queries if 'COUNT(' in query['sql']])
+
+    def test_question_page_uses_counters(self):
+        call_command('recount_counters')
+        question = self.questions[0]
+        Answer.objects.create(question=question, author=self.profile, text='Answer')
+        self.assert_no_aggregates(f'/question/{question.pk}')
+
+        Question.objects.archive([question.pk])
+        self.client.get(f'/question/{question.pk}')
+        self.assert_no_aggregates(f'/question/{question.pk}')
+        self.assertEqual(counters.question_answers_count(ArchivedQuestion.objects.get(pk=question.pk)), 1)
+
+    @override_settings(COUNTERS_CACHE='default')
+    def test_local_memory_cache_is_not_used_for_counters(self):
+        self.assertFalse(counters.counters_shared())
+        with self.assertRaises(CommandError):
+            call_command('recount_counters')
+        self.assertEqual(self.cached_counts(), self.exact_counts())
+
+
+@local_counters
+class FeedsTest(TestCase):
+    def setUp(self):
+        feeds_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(feeds_dir.cleanup)
+        feeds_settings = override_settings(FEEDS_CACHE_DIR=feeds_dir.name, FEEDS_SITE_URL='http://good.example',
+                                           ALLOWED_HOSTS=['testserver', 'good.example', 'evil.example'])
+        feeds_settings.enable()
+        self.addCleanup(feeds_settings.disable)
+        self.feeds_dir = feeds_dir.name
+        self.profile = create_profile(1, 0)
+        Question.objects.create_question(self.profile, 'Question <1>', 'Text', ['python'])
+
+    def get_body(self, response):
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_links_do_not_depend_on_host(self):
+        self.get_body(self.client.get('/feed/new.atom', HTTP_HOST='evil.example'))
+        body = self.get_body(self.client.get('/feed/new.atom', HTTP_HOST='good.example'))
+        self.assertIn(b'http://good.example/question/', body)
+        self.assertNotIn(b'evil.example', body)
+        self.assertIn(b'Question &lt;1&gt;', body)
+
+    def test_conditional_get(self):
+        response = self.client.get('/tag/python/feed.rss')
+        self.get_body(response)
+        self.assertEqual(self.client.get('/tag/python/feed.rss', HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         304)
+
+    def test_unknown_tag(self):
+        self.assertEqual(self.client.get('/tag/nope/feed.rss').status_code, 404)
+        self.assertEqual(os.listdir(self.feeds_dir), [])
+
+    def test_since(self):
+        body = self.get_body(self.client.get('/feed/hot.rss', {'since': '2100-01-01T00:00:00'}))
+        self.assertNotIn(b'<item>', body)
+        body = self.get_body(self.client.get('/feed/new.rss', {'since': '0'}))
+        self.assertIn(b'<item>', body)
+        for since in ['yesterday', '99999999999999999', '1' * 400, '2100-13-01T00:00:00']:
+            self.assertEqual(self.client.get('/feed/new.rss', {'since': since}).status_code, 400)
+        self.assertEqual(self.client.get('/feed/hot.rss', {'since': 'yesterday'}).status_code, 400)
+
+
+@local_counters
+class SnapshotsTest(TestCase):
+    def setUp(self):
+        snapshots_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshots_dir.cleanup)
+        snapshots_settings = override_settings(SNAPSHOTS_DIR=snapshots_dir.name)
+        snapshots_settings.enable()
+        self.addCleanup(snapshots_settings.disable)
+        self.profile = create_profile(1, 0)
+        self.question = Question.objects.create_question(self.profile, 'Snapshot title', 'Text', [])
+        self.path = f'/question/{self.question.pk}'
+
+    def snapshot_files(self):
+        file_path = snapshot_file(self.path)
+        return [path for path in (file_path, file_path + '.gz') if os.path.exists(path)]
+
+    def test_write_snapshot(self):
+        self.assertTrue(write_snapshot(self.path))
+        self.assertEqual(len(self.snapshot_files()), 2)
+        with open(snapshot_file(self.path), 'rb') as snapshot:
+            self.assertIn(b'Snapshot title', snapshot.read())
+
+    def test_missing_page_removes_snapshot(self):
+        write_snapshot(self.path)
+        self.question.delete()
+        self.assertFalse(write_snapshot(self.path))
+        self.assertEqual(self.snapshot_files(), [])
+
+    def test_view_error_removes_snapshot(self):
+        write_snapshot(self.path)
+        with mock.patch.object(Question.objects, 'get_or_archived', side_effect=RuntimeError), \
+                self.assertLogs('app.snapshots', 'ERROR'):
+            self.assertFalse(write_snapshot(self.path))
+        self.assertEqual(self.snapshot_files(), [])
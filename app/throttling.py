@@ -0,0 +1,152 @@
+import logging
+import math
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from threading import Lock
+from django.conf import settings
+from django.core.cache import caches
+from django.http.response import HttpResponse
+
+# scope: (requests allowed in a burst, seconds to refill the whole burst)
+DEFAULT_THROTTLE_RATES = {
+    'ask': (5, 60),
+    'answer': (10, 60),
+    'signup': (3, 600),
+    'vote': (30, 60),
+}
+DEFAULT_LOCAL_BUCKETS_LIMIT = 10000
+CACHE_KEY_PREFIX = 'throttle'
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, capacity, period, tokens=None, updated=None):
+        self.capacity = capacity
+        self.rate = capacity / period  # Tokens per second
+        self.tokens = capacity if tokens is None else tokens
+        self.updated = time.monotonic() if updated is None else updated
+
+    def consume(self, now):
+        """Take one token, return the number of seconds to wait if the bucket is empty"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class LocalBucketStore:
+    def __init__(self, limit=DEFAULT_LOCAL_BUCKETS_LIMIT):
+        self.limit = limit
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def consume(self, key, capacity, period):
+        with self._lock:
+            bucket = self._buckets.pop(key, None) or TokenBucket(capacity, period)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.limit:
+                # Forget the least recently used bucket, it is most likely full again anyway
+                self._buckets.popitem(last=False)
+            return bucket.consume(time.monotonic())
+
+
+class CacheBucketStore:
+    """Buckets shared between workers through the cache backend.
+
+    Read and write are not atomic, so concurrent requests may occasionally
+    slip through, which is fine for load shedding.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def consume(self, key, capacity, period):
+        cache = caches[self.alias]
+        cache_key = f'{CACHE_KEY_PREFIX}:{key}'
+        now = time.time()
+        state = cache.get(cache_key)
+        if state is None:
+            bucket = TokenBucket(capacity, period, updated=now)
+        else:
+            bucket = TokenBucket(capacity, period, tokens=state[0], updated=state[1])
+        wait = bucket.consume(now)
+        cache.set(cache_key, (bucket.tokens, bucket.updated), math.ceil(period))
+        return wait
+
+
+class Throttle:
+    def __init__(self):
+        self.rates = dict(DEFAULT_THROTTLE_RATES, **getattr(settings, 'THROTTLE_RATES', {}))
+        self.cache_alias = getattr(settings, 'THROTTLE_CACHE', None)
+        self.store = CacheBucketStore(self.cache_alias) if self.cache_alias else LocalBucketStore()
+        self.rejections = Counter()  # scope -> rejected requests in this process
+
+    def _count_rejection(self, scope, ident):
+        self.rejections[scope] += 1
+        logger.info('Throttled %s request from %s, %d rejected in this process',
+                    scope, ident, self.rejections[scope])
+        if self.cache_alias:
+            cache = caches[self.cache_alias]
+            cache_key = f'{CACHE_KEY_PREFIX}:rejections:{scope}'
+            cache.add(cache_key, 0, None)
+            cache.incr(cache_key)
+
+    def get_rejections(self):
+        """Rejected requests per scope, summed over all workers when the cache is shared"""
+        if not self.cache_alias:
+            return dict(self.rejections)
+        cache = caches[self.cache_alias]
+        return {scope: cache.get(f'{CACHE_KEY_PREFIX}:rejections:{scope}', 0) for scope in self.rates}
+
+    def check(self, scope, ident):
+        if scope not in self.rates:
+            return 0
+        capacity, period = self.rates[scope]
+        wait = self.store.consume(f'{scope}:{ident}', capacity, period)
+        if wait:
+            self._count_rejection(scope, ident)
+        return wait
+
+
+throttle = Throttle()
+
+
+def client_ip(req):
+    """Address of the client, looking through trusted proxies in X-Forwarded-For"""
+    trusted_proxies = getattr(settings, 'THROTTLE_TRUSTED_PROXIES', ())
+    remote_addr = req.META.get('REMOTE_ADDR')
+    if remote_addr not in trusted_proxies:
+        return remote_addr
+    forwarded = [ip.strip() for ip in req.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    # Proxies append to the header, so the rightmost untrusted address is the one we can rely on
+    for ip in reversed(forwarded):
+        if ip not in trusted_proxies:
+            return ip
+    return remote_addr
+
+
+def throttled_response(wait):
+    response = HttpResponse('Too many requests, try again later', status=429, content_type='text/plain')
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def throttle_view(scope, methods=('POST',)):
+    """Reject write requests over the scope rate with 429 before the view touches the database"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(req, *args, **kwargs):
+            if req.method in methods:
+                # IP bucket goes first, it does not need the session to be loaded
+                wait = throttle.check(scope, f'ip:{client_ip(req)}')
+                if not wait and req.user.is_authenticated:
+                    wait = throttle.check(scope, f'user:{req.user.pk}')
+                if wait:
+                    return throttled_response(wait)
+            return view(req, *args, **kwargs)
+        return wrapped
+    return decorator
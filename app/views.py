@@ -1,8 +1,17 @@
-from django.http.response import HttpResponse
+import os
+from django.http import Http404
+from django.http.response import FileResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.core.paginator import Paginator
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from django.shortcuts import render
 
+from app import feeds
+from app.counters import CountedPaginator, question_answers_count
+from app.models import Question
+from app.throttling import throttle_view
+
 # Create your views here.
 
 
@@ -14,13 +23,6 @@ questions = [
     } for i in range (10)
 ]
 
-comments = [
-    {
-        "title": f"Title {i}",
-        "text": f"This is text for question with title {i}",
-    } for i in range (10)
-]
-
 def index(req):
     paginator = Paginator(questions, 5)
     page_number = req.GET.get('page')
@@ -28,19 +30,27 @@ def index(req):
     return render(req, 'index.html', {'questions' : page_questions})
 
 
+@throttle_view('ask')
 def ask(req): 
     return render(req, 'ask.html', {})
 
 def login(req):
     return render(req, 'login.html', {})
 
+@throttle_view('answer')
 def question(req, question_number=1): 
-    paginator = Paginator(comments, 5)
+    # Closed and old questions live in the archive tables
+    try:
+        question = Question.objects.get_or_archived(question_number)
+    except Question.DoesNotExist:
+        raise Http404('Question not found')
+    paginator = CountedPaginator(question.answer_set.select_related('author'), 5,
+                                 count_provider=lambda: question_answers_count(question))
     page_number = req.GET.get('page')
     page_comments = paginator.get_page(page_number)
-    question = questions[question_number]
     return render(req, 'question.html', {'question': question, 'comments': page_comments})
 
+@throttle_view('signup')
 def register(req): 
     return render(req, 'signup.html', {})
 
@@ -51,4 +61,31 @@ def tag(req, key_tag="None"):
     return render(req, 'tag.html', {'key_tag': key_tag})
 
 
-
+def feed(req, feed_format, feed_name='new', key_tag=None):
+    question_feed = feeds.get_feed(feed_name, key_tag)
+    if question_feed is None or feed_format not in feeds.FEED_FORMATS:
+        raise Http404('Feed not found')
+    content_type = feeds.FEED_FORMATS[feed_format]
+
+    since = req.GET.get('since')
+    if since is not None:
+        since_dt = feeds.parse_since(since)
+        if since_dt is None:
+            return HttpResponseBadRequest('Invalid since timestamp')
+        # Incremental queries only read the newest rows, no need to cache them
+        return StreamingHttpResponse(feeds.feed_chunks(question_feed, feed_format, since_dt),
+                                     content_type=content_type)
+
+    path = feeds.build_feed_file(question_feed, feed_format)
+    feed_file = open(path, 'rb')
+    stat = os.fstat(feed_file.fileno())
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    not_modified = get_conditional_response(req, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        feed_file.close()
+        return not_modified
+
+    response = FileResponse(feed_file, content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'askme.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after the Django setup, event streams need the app registry
+from app.sse import events_application  # noqa: E402
+
+application = events_application(django_application)
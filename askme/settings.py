@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'app',
 ]
 
 MIDDLEWARE = [
@@ -128,3 +129,85 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+
+# Reputation leaderboard, see app/leaderboard.py
+# Each worker keeps its own copy, reloaded from the database this often (seconds) to catch up with the others
+
+LEADERBOARD_RELOAD_INTERVAL = 60
+
+# Write endpoints throttling, see app/throttling.py
+# scope: (requests allowed in a burst, seconds to refill the whole burst)
+
+THROTTLE_RATES = {
+    'ask': (5, 60),
+    'answer': (10, 60),
+    'signup': (3, 600),
+    'vote': (30, 60),
+}
+
+# Cache alias to share token buckets between workers, None keeps them per process
+THROTTLE_CACHE = None
+
+# Addresses of the front servers, for their requests the client is taken from X-Forwarded-For
+THROTTLE_TRUSTED_PROXIES = ['127.0.0.1']
+
+# Live question events, see app/events.py
+# Seconds between database polls picking up changes made by other workers, None disables polling
+
+QUESTION_EVENTS_POLL_INTERVAL = 5
+
+# Questions archive, see app/management/commands/archive_questions.py
+# Questions older than this are moved to the archive tables, as well as closed ones
+
+ARCHIVE_AFTER_DAYS = 365
+
+# Upper bound of questions kept in the hot table, None means no bound
+
+ARCHIVE_MAX_HOT_QUESTIONS = None
+
+# Cached counts for paginators, see app/counters.py
+# Counters must be shared by all workers and need atomic increments, i.e. a redis or
+# memcached cache, e.g. add to CACHES
+#     'counters': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379',
+#     },
+# and set COUNTERS_CACHE = 'counters'. With the local-memory default there are no
+# exact counters, pages use estimates and counts cached for COUNTERS_ESTIMATE_TIMEOUT
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+COUNTERS_CACHE = 'default'
+
+# Seconds an exact counter is kept. Run recount_counters more often than that, e.g. hourly
+# from cron, it resets counters which drifted; expired ones fall back to the estimates
+
+COUNTERS_TIMEOUT = 24 * 60 * 60
+
+# Seconds an estimated count is cached when there is no exact counter
+
+COUNTERS_ESTIMATE_TIMEOUT = 300
+
+# Syndication feeds, see app/feeds.py
+# Feeds are serialized to this directory at most once per update window (seconds)
+
+FEEDS_CACHE_DIR = BASE_DIR / 'feeds_cache'
+
+# Prefix of the links in feeds, empty for links relative to the site root
+
+FEEDS_SITE_URL = 'http://localhost:8000'
+
+FEEDS_UPDATE_WINDOW = 60
+
+FEEDS_ITEMS = 50
+
+# Pre-rendered pages for anonymous readers, see app/snapshots.py
+# The front server should serve <SNAPSHOTS_DIR><path>.html (or .html.gz) to requests without a session cookie
+
+SNAPSHOTS_ENABLED = False
+
+SNAPSHOTS_DIR = BASE_DIR / 'snapshots'
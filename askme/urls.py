@@ -28,6 +28,9 @@ urlpatterns = [
     path('signup', views.register),
     path('settings', views.settings),
     path('tag/<str:key_tag>', views.tag),
+    path('feed/new.<str:feed_format>', views.feed, {'feed_name': 'new'}),
+    path('feed/hot.<str:feed_format>', views.feed, {'feed_name': 'hot'}),
+    path('tag/<str:key_tag>/feed.<str:feed_format>', views.feed, {'feed_name': 'tag'}),
 
 
 